@@ -1,136 +1,462 @@
 import csv
 import json
+import os
+import sys
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+try:
+    import orjson  # opcional: serializa en C, mucho más rápido que json
+except ImportError:
+    orjson = None
+
+
+def _sin_comentarios(lineas):
+    """Recorre las líneas quitando comentarios (#) y descartando las vacías."""
+    for linea in lineas:
+        linea = linea.split('#', 1)[0].strip()
+        if linea:
+            yield linea
+
+
+# Árbol usado por cada proceso de validación en paralelo (ver validar_uniones).
+_arbol_proceso = None
+
+
+def _iniciar_proceso(arbol):
+    global _arbol_proceso
+    _arbol_proceso = arbol
+
+
+def _validar_lote(pares):
+    return [_arbol_proceso._validar_union(a, b) for a, b in pares]
+
 
 class Persona:
+    __slots__ = ('id', 'nombre', 'padre_id', 'madre_id')
+
+    # Cuenta los cambios de id/padres en personas ya creadas; ArbolGenealogico
+    # lo compara para saber si su índice de posiciones quedó desactualizado.
+    _version = 0
+
     def __init__(self, id_, nombre, padre_id=None, madre_id=None):
-        self.id = id_
-        self.nombre = nombre
-        self.padre_id = padre_id if padre_id else None
-        self.madre_id = madre_id if madre_id else None
+        asignar = object.__setattr__  # una persona nueva todavía no está en ningún árbol
+        asignar(self, 'id', id_)
+        asignar(self, 'nombre', nombre)
+        asignar(self, 'padre_id', padre_id if padre_id else None)
+        asignar(self, 'madre_id', madre_id if madre_id else None)
+
+    def __setattr__(self, atributo, valor):
+        object.__setattr__(self, atributo, valor)
+        if atributo != 'nombre':
+            Persona._version += 1
+
+
+class _DictPersonas(dict):
+    """dict id -> Persona que cuenta sus modificaciones en 'version'."""
+    __slots__ = ('version',)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.version = 0
+
+    def __reduce__(self):
+        return (_DictPersonas, (dict(self),))
+
+    def __setitem__(self, clave, valor):
+        super().__setitem__(clave, valor)
+        self.version += 1
+
+    def __delitem__(self, clave):
+        super().__delitem__(clave)
+        self.version += 1
+
+    def __ior__(self, otro):
+        self.update(otro)
+        return self
+
+    def clear(self):
+        super().clear()
+        self.version += 1
+
+    def pop(self, *args):
+        self.version += 1
+        return super().pop(*args)
+
+    def popitem(self):
+        self.version += 1
+        return super().popitem()
+
+    def setdefault(self, clave, valor=None):
+        self.version += 1
+        return super().setdefault(clave, valor)
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        self.version += 1
 
 
 class ArbolGenealogico:
     def __init__(self):
-        self.personas = {}
+        self._personas = _DictPersonas()
         self.uniones = []
         self.max_generaciones = 2  # límite configurable
+        self.tamano_lote = 10000   # uniones por lote al validar en paralelo
+        # Vista "estructura de arreglos" de self.personas: cada id recibe una
+        # posición entera y los padres se guardan como posiciones (-1 = sin dato).
+        self._ids = []                  # posición -> id
+        self._indice = {}               # id -> posición
+        self._padre_idx = array('i')
+        self._madre_idx = array('i')
+        self._profundidad = array('i')  # camino más largo desde una raíz; -1 en ciclos
+        self._indexado = None           # versiones de personas/Persona del último _indexar
+        self._anc_cache = {}    # (posición, k) -> frozenset de posiciones hasta k generaciones
+
+    @property
+    def personas(self):
+        """dict id -> Persona. Se puede modificar libremente (agregar, reemplazar o
+        borrar personas, o cambiar sus padres): el índice interno se reconstruye
+        en la siguiente consulta."""
+        return self._personas
+
+    @personas.setter
+    def personas(self, personas):
+        # se copia a un dict propio que registra sus modificaciones
+        self._personas = _DictPersonas(personas)
+        self._indexado = None
 
     # ---------------------------
     # CARGA DE DATOS
     # ---------------------------
     def cargar_personas(self, nombre_archivo):
         with open(nombre_archivo, newline='', encoding='utf-8') as f:
-            lector = csv.DictReader(f)
+            lector = csv.reader(f)
+            encabezado = next(lector, None)
+            if encabezado is None:
+                return
+            i_id, i_nombre, i_padre, i_madre = (
+                encabezado.index(c) for c in ('id', 'nombre', 'padre_id', 'madre_id'))
+            ancho = len(encabezado)
             for fila in lector:
-                id_ = fila['id'].strip()
-                nombre = fila['nombre'].strip()
-                padre_id = fila['padre_id'].strip() if fila['padre_id'] else None
-                madre_id = fila['madre_id'].strip() if fila['madre_id'] else None
+                if not fila:
+                    continue
+                if len(fila) < ancho:
+                    fila += [''] * (ancho - len(fila))
+                # ids internados: el mismo id leído en varias filas es el mismo
+                # objeto, así las comparaciones y búsquedas en dicts son más baratas
+                id_ = sys.intern(fila[i_id].strip())
+                nombre = fila[i_nombre].strip()
+                padre_id = fila[i_padre].strip()
+                madre_id = fila[i_madre].strip()
+                padre_id = sys.intern(padre_id) if padre_id else None
+                madre_id = sys.intern(madre_id) if madre_id else None
                 self.personas[id_] = Persona(id_, nombre, padre_id, madre_id)
+        self._indexar()
+
+    def _indexar(self):
+        """Reconstruye los arreglos de posiciones a partir de self.personas.
+
+        Los padres que no figuran como persona también reciben posición (sin
+        padres propios), igual que antes se los contaba como ancestros.
+        """
+        ids = list(self.personas)
+        indice = {id_: i for i, id_ in enumerate(ids)}
+        for persona in self.personas.values():
+            for padre in (persona.padre_id, persona.madre_id):
+                if padre and padre not in indice:
+                    indice[padre] = len(ids)
+                    ids.append(padre)
+        padre_idx = array('i', [-1]) * len(ids)
+        madre_idx = array('i', [-1]) * len(ids)
+        for i, persona in enumerate(self.personas.values()):
+            if persona.padre_id:
+                padre_idx[i] = indice[persona.padre_id]
+            if persona.madre_id:
+                madre_idx[i] = indice[persona.madre_id]
+        self._ids = ids
+        self._indice = indice
+        self._padre_idx = padre_idx
+        self._madre_idx = madre_idx
+        self._profundidad = self._calcular_profundidades()
+        self._indexado = (self._personas.version, Persona._version)
+        self._anc_cache.clear()
+
+    def _calcular_profundidades(self):
+        """profundidad[i]: largo del camino más largo desde una persona sin padres
+        hasta la posición i (orden topológico de Kahn); -1 si está dentro (o
+        debajo) de un ciclo.
+        """
+        n = len(self._ids)
+        padre_idx = self._padre_idx
+        madre_idx = self._madre_idx
+        pendientes = [0] * n
+        hijos = [[] for _ in range(n)]
+        for i in range(n):
+            for padre in (padre_idx[i], madre_idx[i]):
+                if padre != -1:
+                    pendientes[i] += 1
+                    hijos[padre].append(i)
+        profundidad = array('i', [-1]) * n
+        cola = deque(i for i in range(n) if pendientes[i] == 0)
+        while cola:
+            i = cola.popleft()
+            prof = 0
+            for padre in (padre_idx[i], madre_idx[i]):
+                if padre != -1:
+                    prof = max(prof, profundidad[padre] + 1)
+            profundidad[i] = prof
+            for hijo in hijos[i]:
+                pendientes[hijo] -= 1
+                if pendientes[hijo] == 0:
+                    cola.append(hijo)
+        return profundidad
+
+    def _asegurar_indice(self):
+        """Reindexa si self.personas o alguna Persona cambió desde el último _indexar
+        (p. ej. personas agregadas o editadas a mano en lugar de con cargar_personas)."""
+        if self._indexado != (self._personas.version, Persona._version):
+            self._indexar()
 
     def cargar_uniones(self, nombre_archivo):
-        lineas = []
         with open(nombre_archivo, encoding='utf-8') as f:
-            for linea in f:
-                linea = linea.split('#')[0].strip()  # elimina comentarios
-                if linea:
-                    lineas.append(linea)
-        lector = csv.DictReader(lineas)
-        for fila in lector:
-            p1 = fila['persona_a'].strip()
-            p2 = fila['persona_b'].strip()
-            self.uniones.append((p1, p2))
+            lector = csv.reader(_sin_comentarios(f))
+            encabezado = next(lector, None)
+            if encabezado is None:
+                return
+            i_a = encabezado.index('persona_a')
+            i_b = encabezado.index('persona_b')
+            for fila in lector:
+                self.uniones.append((sys.intern(fila[i_a].strip()), sys.intern(fila[i_b].strip())))
 
     # ---------------------------
     # RELACIONES FAMILIARES
     # ---------------------------
     def obtener_nombre(self, id_):
-        return self.personas[id_].nombre if id_ in self.personas else f"Desconocido({id_})"
+        persona = self.personas.get(id_)
+        return persona.nombre if persona is not None else f"Desconocido({id_})"
 
     def es_asc_desc(self, a, b):
         """True si a es ascendiente o descendiente de b."""
-        return self._es_asc(a, b) or self._es_asc(b, a)
+        self._asegurar_indice()
+        if not a or not b:
+            return False
+        get = self._indice.get
+        return self._es_asc_desc_idx(get(a, -1), get(b, -1))
+
+    def _es_asc_desc_idx(self, ia, ib):
+        if ia == -1 or ib == -1:
+            return False
+        return self._es_ancestro_idx(ia, ib) or self._es_ancestro_idx(ib, ia)
+
+    def _es_ancestro_idx(self, ia, ib):
+        """True si la posición ia es ascendiente de ib (BFS hacia arriba, sin caché).
 
-    def _es_asc(self, asc, desc):
-        if not asc or not desc:
+        No se sube por personas con profundidad <= la de ia: ninguna de ellas
+        puede descender de ia.
+        """
+        padre_idx = self._padre_idx
+        madre_idx = self._madre_idx
+        profundidad = self._profundidad
+        prof_a = profundidad[ia]
+        if prof_a >= 0 and 0 <= profundidad[ib] <= prof_a:
             return False
-        padre = self.personas[desc].padre_id
-        madre = self.personas[desc].madre_id
-        if asc == padre or asc == madre:
-            return True
-        return (padre and self._es_asc(asc, padre)) or (madre and self._es_asc(asc, madre))
+        visitados = {ib}
+        cola = deque([ib])
+        while cola:
+            actual = cola.popleft()
+            for padre in (padre_idx[actual], madre_idx[actual]):
+                if padre == -1:
+                    continue
+                if padre == ia:
+                    return True
+                if padre not in visitados:
+                    visitados.add(padre)
+                    if prof_a >= 0 and 0 <= profundidad[padre] <= prof_a:
+                        continue
+                    cola.append(padre)
+        return False
 
     def son_hermanos(self, a, b):
-        pa, ma = self.personas[a].padre_id, self.personas[a].madre_id
-        pb, mb = self.personas[b].padre_id, self.personas[b].madre_id
-        return pa and ma and pa == pb and ma == mb
+        self._asegurar_indice()
+        get = self._indice.get
+        return self._son_hermanos_idx(get(a, -1), get(b, -1))
+
+    def _son_hermanos_idx(self, ia, ib):
+        if ia == -1 or ib == -1:
+            return False
+        padre_idx = self._padre_idx
+        madre_idx = self._madre_idx
+        pa, ma = padre_idx[ia], madre_idx[ia]
+        pb, mb = padre_idx[ib], madre_idx[ib]
+        return pa != -1 and ma != -1 and pa == pb and ma == mb
 
     def ancestros(self, id_, k):
-        """Devuelve el conjunto de ancestros hasta k generaciones."""
+        """Devuelve el conjunto de ids de ancestros hasta k generaciones."""
+        self._asegurar_indice()
+        ids = self._ids
+        return {ids[x] for x in self._ancestros_idx(self._indice.get(id_, -1), k)}
+
+    def _ancestros_idx(self, i, k):
+        """Posiciones de los ancestros de la posición i hasta k generaciones.
+
+        Recorrido iterativo con pila explícita de (posición, generaciones restantes);
+        si un (posición, k) intermedio ya está cacheado se reutiliza en lugar de subir.
+        """
+        anc_cache = self._anc_cache
+        clave = (i, k)
+        cache = anc_cache.get(clave)
+        if cache is not None:
+            return cache
+        padre_idx = self._padre_idx
+        madre_idx = self._madre_idx
         resultado = set()
-        self._ancestros_rec(id_, k, resultado)
+        restante = {}  # posición -> mayor cantidad de generaciones con la que ya se apiló
+        pila = [(i, k)] if i != -1 else []
+        while pila:
+            actual, kk = pila.pop()
+            if kk == 0:
+                continue
+            cacheado = anc_cache.get((actual, kk))
+            if cacheado is not None:
+                resultado |= cacheado
+                continue
+            for padre in (padre_idx[actual], madre_idx[actual]):
+                if padre != -1:
+                    resultado.add(padre)
+                    if restante.get(padre, 0) < kk - 1:
+                        restante[padre] = kk - 1
+                        pila.append((padre, kk - 1))
+        resultado = frozenset(resultado)
+        anc_cache[clave] = resultado
         return resultado
 
-    def _ancestros_rec(self, id_, k, resultado):
-        if k == 0 or id_ not in self.personas:
-            return
-        persona = self.personas[id_]
-        for padre in [persona.padre_id, persona.madre_id]:
-            if padre:
-                resultado.add(padre)
-                self._ancestros_rec(padre, k - 1, resultado)
+    def _comparten_ancestro(self, ia, ib, k):
+        """True si las posiciones ia e ib tienen un ancestro común en ≤ k generaciones.
+
+        Sube un nivel desde ia y otro desde ib en forma alternada, marcando cada
+        ancestro con el lado que lo alcanzó (1 = ia, 2 = ib); termina apenas un
+        ancestro queda marcado por ambos lados.
+        """
+        if ia == -1 or ib == -1:
+            return False
+        padre_idx = self._padre_idx
+        madre_idx = self._madre_idx
+        marca = {}
+        frentes = [[ia], [ib]]
+        for _ in range(k):
+            for lado, propio, otro in ((0, 1, 2), (1, 2, 1)):
+                siguiente = []
+                for v in frentes[lado]:
+                    for padre in (padre_idx[v], madre_idx[v]):
+                        if padre == -1:
+                            continue
+                        m = marca.get(padre, 0)
+                        if m & otro:
+                            return True
+                        if not m & propio:
+                            marca[padre] = m | propio
+                            siguiente.append(padre)
+                frentes[lado] = siguiente
+            if not frentes[0] and not frentes[1]:
+                break
+        return False
 
     # ---------------------------
     # VALIDACIÓN DE UNIONES
     # ---------------------------
     def validar_uniones(self):
-        resultados = []
+        """Valida todas las uniones cargadas, en el mismo orden.
 
-        for a, b in self.uniones:
-            nombre_a = self.obtener_nombre(a)
-            nombre_b = self.obtener_nombre(b)
-            estado = "OK"
-            motivo = ""
+        Cada unión es independiente: si hay más de un CPU y al menos dos lotes
+        de self.tamano_lote uniones se reparten entre procesos (el árbol se
+        envía una vez a cada proceso); con menos no compensa lanzarlos. Si no
+        se pueden crear procesos se valida en serie.
+        """
+        self._asegurar_indice()
+        uniones = self.uniones
+        tamano = self.tamano_lote
+        procesos = os.cpu_count() or 1
+        if procesos > 1 and len(uniones) >= 2 * tamano:
+            lotes = [uniones[i:i + tamano] for i in range(0, len(uniones), tamano)]
+            try:
+                resultados = []
+                with ProcessPoolExecutor(max_workers=min(procesos, len(lotes)),
+                                         initializer=_iniciar_proceso,
+                                         initargs=(self,)) as ejecutor:
+                    for parcial in ejecutor.map(_validar_lote, lotes):
+                        resultados.extend(parcial)
+                return resultados
+            except (OSError, NotImplementedError, BrokenProcessPool):
+                # sin soporte para procesos (sandbox, plataforma): se sigue en serie
+                pass
 
-            # a) ascendiente/descendiente
-            if self.es_asc_desc(a, b):
-                estado = "NO PERMITIDO"
-                motivo = f"Relación ascendiente/descendiente entre {nombre_a} y {nombre_b}"
+        validar = self._validar_union
+        return [validar(a, b) for a, b in uniones]
+
+    def _validar_union(self, a, b):
+        obtener_nombre = self.obtener_nombre
+        nombre_a = obtener_nombre(a)
+        nombre_b = obtener_nombre(b)
+        estado = "OK"
+        motivo = ""
+        # posiciones resueltas una sola vez para las tres reglas
+        get = self._indice.get
+        ia = get(a, -1)
+        ib = get(b, -1)
+
+        # a) ascendiente/descendiente
+        if a and b and self._es_asc_desc_idx(ia, ib):
+            estado = "NO PERMITIDO"
+            motivo = f"Relación ascendiente/descendiente entre {nombre_a} y {nombre_b}"
 
-            # b) hermanos
-            elif self.son_hermanos(a, b):
+        # b) hermanos
+        elif self._son_hermanos_idx(ia, ib):
+            estado = "NO PERMITIDO"
+            motivo = f"Son hermanos ({nombre_a} y {nombre_b})"
+
+        # c) comparten ancestro en ≤ k generaciones
+        else:
+            k = self.max_generaciones
+            # búsqueda con corte temprano; los conjuntos de ancestros sólo se
+            # arman para informar los nombres
+            if self._comparten_ancestro(ia, ib, k):
+                anc_a = self._ancestros_idx(ia, k)
+                anc_b = self._ancestros_idx(ib, k)
+                # se recorre el conjunto más chico y se prueba en el más grande
+                chico, grande = (anc_a, anc_b) if len(anc_a) < len(anc_b) else (anc_b, anc_a)
+                comunes = [x for x in chico if x in grande]
+                ids = self._ids
+                nombres_comunes = [obtener_nombre(ids[x]) for x in comunes]
                 estado = "NO PERMITIDO"
-                motivo = f"Son hermanos ({nombre_a} y {nombre_b})"
-
-            # c) comparten ancestro en ≤ k generaciones
-            else:
-                anc_a = self.ancestros(a, self.max_generaciones)
-                anc_b = self.ancestros(b, self.max_generaciones)
-                comunes = anc_a.intersection(anc_b)
-                if comunes:
-                    nombres_comunes = [self.obtener_nombre(x) for x in comunes]
-                    estado = "NO PERMITIDO"
-                    motivo = f"Comparten ancestro en ≤ {self.max_generaciones} generaciones: {nombres_comunes}"
-
-            resultados.append({
-                "persona_a": nombre_a,
-                "persona_b": nombre_b,
-                "estado": estado,
-                "motivo": motivo
-            })
-
-        return resultados
+                motivo = f"Comparten ancestro en ≤ {k} generaciones: {nombres_comunes}"
+
+        return {
+            "persona_a": nombre_a,
+            "persona_b": nombre_b,
+            "estado": estado,
+            "motivo": motivo
+        }
 
     # ---------------------------
     # SALIDA
     # ---------------------------
     def imprimir_resultados(self, resultados):
-        for r in resultados:
-            print(f"{r['persona_a']} - {r['persona_b']}: {r['estado']}. {r['motivo']}")
+        if not resultados:
+            return
+        # una sola escritura en lugar de un print por resultado
+        sys.stdout.write("\n".join(
+            f"{r['persona_a']} - {r['persona_b']}: {r['estado']}. {r['motivo']}" for r in resultados
+        ) + "\n")
 
     def guardar_json(self, resultados, nombre_archivo="resultado.json"):
-        with open(nombre_archivo, "w", encoding="utf-8") as f:
-            json.dump(resultados, f, ensure_ascii=False, indent=4)
+        if orjson is not None:
+            with open(nombre_archivo, "wb") as f:
+                f.write(orjson.dumps(resultados, option=orjson.OPT_INDENT_2))
+        else:
+            with open(nombre_archivo, "w", encoding="utf-8") as f:
+                json.dump(resultados, f, ensure_ascii=False, indent=2)
         print(f"\n✅ Resultados guardados en {nombre_archivo}")
 
 
@@ -3,7 +3,13 @@
 import csv
 import json
 import sys
-from collections import deque, defaultdict
+from array import array
+from collections import deque, namedtuple
+
+try:
+    import orjson  # opcional: serializa en C, mucho más rápido que json
+except ImportError:
+    orjson = None
 
 # ---- CONFIG / NOMBRES DE ARCHIVOS ----
 PERSONAS_CSV = "personas.csv"
@@ -36,12 +42,22 @@ def cargar_personas(path):
     personas = {}
     try:
         with open(path, newline='', encoding='utf-8') as f:
-            r = csv.DictReader(f)
+            r = csv.reader(f)
+            encabezado = next(r, [])
+            i_id = next((i for i, c in enumerate(encabezado) if c in ('id', 'ID', 'Id')), None)
+            if i_id is None:
+                return personas
+            # una tupla con nombre por fila: liviana como una lista, pero los
+            # campos siguen accesibles por nombre (fila.nombre, fila.padre_id...)
+            FilaPersona = namedtuple("FilaPersona", encabezado, rename=True)
+            n = len(encabezado)
             for row in r:
-                pid = row.get('id') or row.get('ID') or row.get('Id')
-                if pid is None:
+                pid = row[i_id] if i_id < len(row) else None
+                if not pid:
                     continue
-                personas[pid] = row  # guardamos la fila completa por si hace falta nombre u otros datos
+                if len(row) != n:
+                    row = (row + [''] * n)[:n]
+                personas[sys.intern(pid)] = FilaPersona._make(row)
     except FileNotFoundError:
         print(f"Error: no existe {path}")
         sys.exit(1)
@@ -53,6 +69,9 @@ def cargar_uniones(path):
     try:
         with open(path, newline='', encoding='utf-8') as f:
             r = csv.DictReader(f)
+            # encabezados en minúscula una sola vez: 'Padre', 'PADRE' -> 'padre'
+            if r.fieldnames:
+                r.fieldnames = [c.lower() for c in r.fieldnames]
             for row in r:
                 uniones.append(row)
     except FileNotFoundError:
@@ -61,93 +80,225 @@ def cargar_uniones(path):
     return uniones
 
 # ---- CONSTRUCCIÓN DE GRAFOS ----
+# El grafo se guarda en formato CSR (filas comprimidas): cada persona tiene una
+# posición entera v, sus padres son padres_idx[padres_ptr[v]:padres_ptr[v+1]]
+# y sus hijos hijos_idx[hijos_ptr[v]:hijos_ptr[v+1]]. Son arreglos planos de
+# enteros en lugar de un dict con una lista/set por persona.
+Grafo = namedtuple("Grafo", ["ids", "posicion", "padres_ptr", "padres_idx", "hijos_ptr", "hijos_idx"])
+
+def _csr(n, aristas):
+    """Arma (ptr, idx) en formato CSR a partir de aristas (origen, destino).
+       Se devuelven como listas planas: leer de un array('i') crea un int
+       nuevo en cada acceso, y los recorridos leen estos valores muchas veces."""
+    ptr = array('i', [0]) * (n + 1)
+    for origen, _ in aristas:
+        ptr[origen + 1] += 1
+    for v in range(n):
+        ptr[v + 1] += ptr[v]
+    idx = array('i', [0]) * len(aristas)
+    libre = ptr[:-1]
+    for origen, destino in aristas:
+        idx[libre[origen]] = destino
+        libre[origen] += 1
+    return ptr.tolist(), idx.tolist()
+
 def construir_grafos(uniones):
-    padres = defaultdict(list)   # hijo -> [padre, madre]
-    hijos = defaultdict(set)     # persona -> set(hijos)
-    parejas = set()              # conjunto de pares (a,b) que aparecen como pareja
+    aristas = {}      # (hijo, padre/madre) sin repetir, en orden de aparición
+    personas = set()  # toda persona mencionada en alguna unión
+    parejas = {}      # pares (a,b) con a <= b, sin repetir, en orden de aparición
 
     for u in uniones:
-        padre = u.get('padre') or u.get('Padre')
-        madre = u.get('madre') or u.get('Madre')
-        hijo  = u.get('hijo')  or u.get('Hijo')
+        padre = u.get('padre')
+        madre = u.get('madre')
+        hijo  = u.get('hijo')
+        # ids internados: cada id repetido en muchas filas pasa a ser un único objeto
+        padre = sys.intern(padre) if padre else None
+        madre = sys.intern(madre) if madre else None
+        hijo = sys.intern(hijo) if hijo else None
         # si el archivo tiene id_union y una fila por hijo, OK
         if hijo:
-            if padre: 
-                padres[hijo].append(padre)
-                hijos[padre].add(hijo)
+            personas.add(hijo)
+            if padre:
+                aristas[(hijo, padre)] = None
             if madre:
-                padres[hijo].append(madre)
-                hijos[madre].add(hijo)
-        # registrar la pareja
+                aristas[(hijo, madre)] = None
+        if padre:
+            personas.add(padre)
+        if madre:
+            personas.add(madre)
+        # registrar la pareja (el orden padre/madre no importa para validarla)
         if padre and madre:
-            parejas.add((padre, madre))
-            parejas.add((madre, padre))
-    return padres, hijos, parejas
+            parejas[(padre, madre) if padre <= madre else (madre, padre)] = None
 
-# ---- RECORRIDOS ----
-def ancestros(persona, padres_map, k):
-    """Devuelve set de ancestros de 'persona' hasta k generaciones.
-       Generacion 1 = padres directos, generacion 2 = padres de padres, etc."""
-    resultado = set()
-    if persona is None:
-        return resultado
-    q = deque()
-    # (node, nivel) nivel 0 = la persona misma; padres están a nivel 1
-    q.append((persona, 0))
-    visited = set([persona])
-    while q:
-        node, nivel = q.popleft()
-        if nivel >= k:
-            continue
-        # buscar padres del nodo
-        for p in padres_map.get(node, []):
-            if p not in resultado:
-                resultado.add(p)
-            if p not in visited:
-                visited.add(p)
-                q.append((p, nivel+1))
-    return resultado
+    ids = sorted(personas)
+    posicion = {v: i for i, v in enumerate(ids)}
+    hacia_padres = [(posicion[h], posicion[p]) for h, p in aristas]
+    padres_ptr, padres_idx = _csr(len(ids), hacia_padres)
+    hijos_ptr, hijos_idx = _csr(len(ids), [(p, h) for h, p in hacia_padres])
+    grafo = Grafo(ids, posicion, padres_ptr, padres_idx, hijos_ptr, hijos_idx)
+    return grafo, list(parejas)
 
-def es_ancestro(a, b, padres_map):
-    """True si a es ancestro de b en cualquier número de generaciones (bucle protegido)."""
+# ---- RECORRIDOS ----
+# Todos los recorridos trabajan con posiciones enteras del grafo.
+def es_ancestro(a, b, grafo, profundidad=None):
+    """True si a es ancestro de b en cualquier número de generaciones (bucle protegido).
+       Con 'profundidad' (ver calcular_profundidades) no se sube por personas con
+       profundidad <= la de a: ninguna de ellas puede descender de a."""
     if a == b:
         return False
+    prof_a = profundidad[a] if profundidad is not None else -1
+    if prof_a >= 0:
+        prof_b = profundidad[b]
+        if 0 <= prof_b <= prof_a:
+            return False
+    ptr, idx = grafo.padres_ptr, grafo.padres_idx
     # DFS/BFS subiendo
     q = deque([b])
     visited = set([b])
     while q:
         node = q.popleft()
-        for p in padres_map.get(node, []):
+        for j in range(ptr[node], ptr[node + 1]):
+            p = idx[j]
             if p == a:
                 return True
             if p not in visited:
                 visited.add(p)
+                if prof_a >= 0 and 0 <= profundidad[p] <= prof_a:
+                    continue
                 q.append(p)
     return False
 
-def son_hermanos(a, b, padres_map):
+def son_hermanos(a, b, grafo):
     if a == b:
         return False
-    pa = set(padres_map.get(a, []))
-    pb = set(padres_map.get(b, []))
-    return len(pa.intersection(pb)) > 0
+    # cada persona tiene a lo sumo un par de padres: comparar uno a uno
+    # sale más barato que armar dos sets por llamada
+    ptr, idx = grafo.padres_ptr, grafo.padres_idx
+    ini_b, fin_b = ptr[b], ptr[b + 1]
+    for i in range(ptr[a], ptr[a + 1]):
+        p = idx[i]
+        for j in range(ini_b, fin_b):
+            if idx[j] == p:
+                return True
+    return False
+
+def ancestros(persona, grafo, k):
+    """Devuelve set de ancestros de 'persona' hasta k generaciones.
+       Generacion 1 = padres directos, generacion 2 = padres de padres, etc."""
+    ptr, idx = grafo.padres_ptr, grafo.padres_idx
+    resultado = set()
+    frente = [persona]
+    for _ in range(k):
+        siguiente = []
+        for v in frente:
+            for p in idx[ptr[v]:ptr[v + 1]]:
+                if p not in resultado:
+                    resultado.add(p)
+                    siguiente.append(p)
+        if not siguiente:
+            break
+        frente = siguiente
+    return resultado
+
+def comparten_ancestro(a, b, grafo, k):
+    """True si a y b tienen un ancestro común en <= k generaciones.
+       Sube un nivel desde a y otro desde b en forma alternada, marcando cada
+       ancestro con el lado que lo alcanzó (1 = a, 2 = b); termina apenas un
+       ancestro queda marcado por ambos lados, sin armar los conjuntos completos."""
+    ptr, idx = grafo.padres_ptr, grafo.padres_idx
+    marca = {}
+    frentes = [[a], [b]]
+    for _ in range(k):
+        for lado, propio, otro in ((0, 1, 2), (1, 2, 1)):
+            siguiente = []
+            for v in frentes[lado]:
+                for p in idx[ptr[v]:ptr[v + 1]]:
+                    m = marca.get(p, 0)
+                    if m & otro:
+                        return True
+                    if not m & propio:
+                        marca[p] = m | propio
+                        siguiente.append(p)
+            frentes[lado] = siguiente
+        if not frentes[0] and not frentes[1]:
+            break
+    return False
+
+# ---- PROFUNDIDADES ----
+# No se guardan conjuntos de ancestros por persona: en un árbol grande (o con
+# max_generaciones >= su profundidad) ocupan O(N x ancestros) de memoria. Cada
+# pareja se resuelve con recorridos acotados, y la profundidad de cada persona
+# alcanza para podar la búsqueda de la regla a).
+def calcular_profundidades(grafo):
+    """profundidad[i]: largo del camino más largo desde una persona sin padres
+       hasta la posición i (orden topológico de Kahn); -1 si está dentro (o
+       debajo) de un ciclo."""
+    n = len(grafo.ids)
+    padres_ptr, padres_idx = grafo.padres_ptr, grafo.padres_idx
+    hijos_ptr, hijos_idx = grafo.hijos_ptr, grafo.hijos_idx
+
+    pendientes = [padres_ptr[i + 1] - padres_ptr[i] for i in range(n)]
+    q = deque(i for i in range(n) if pendientes[i] == 0)
+    profundidad = array('i', [-1]) * n
+    while q:
+        i = q.popleft()
+        prof = 0
+        for j in range(padres_ptr[i], padres_ptr[i + 1]):
+            prof = max(prof, profundidad[padres_idx[j]] + 1)
+        profundidad[i] = prof
+        for j in range(hijos_ptr[i], hijos_ptr[i + 1]):
+            h = hijos_idx[j]
+            pendientes[h] -= 1
+            if pendientes[h] == 0:
+                q.append(h)
+    return profundidad
 
 # ---- VALIDACIÓN ----
-def validar_union(a, b, padres_map, max_gen):
-    # regla a) asc/desc
-    if es_ancestro(a, b, padres_map) or es_ancestro(b, a, padres_map):
-        return (False, "Ascendiente/descendiente directo")
-    # regla b) hermanos
-    if son_hermanos(a, b, padres_map):
-        return (False, "Hermanos (comparten padre/madre conocido)")
-    # regla c) comparten ancestro en <= k generaciones
-    anc_a = ancestros(a, padres_map, max_gen)
-    anc_b = ancestros(b, padres_map, max_gen)
-    inter = anc_a.intersection(anc_b)
-    if inter:
-        return (False, f"Comparten ancestro en ≤{max_gen} generaciones: {', '.join(sorted(inter))}")
-    # si pasa todo: permitido
-    return (True, "OK")
+def validar_lote(pares, grafo, profundidad, max_gen):
+    """Valida una secuencia de parejas (a, b) y devuelve [(permitido, motivo)].
+       Los ids se traducen a posiciones enteras una sola vez por pareja y el
+       resto del bucle trabaja sólo con enteros y los arreglos CSR."""
+    posicion = grafo.posicion
+    ids = grafo.ids
+    resultados = []
+    for a, b in pares:
+        ia = posicion.get(a)
+        ib = posicion.get(b)
+        # personas fuera del grafo: sin padres ni ancestros conocidos
+        if ia is None or ib is None:
+            resultados.append((True, "OK"))
+            continue
+        if a != b:
+            # regla a) asc/desc
+            if es_ancestro(ia, ib, grafo, profundidad) or es_ancestro(ib, ia, grafo, profundidad):
+                resultados.append((False, "Ascendiente/descendiente directo"))
+                continue
+            # regla b) hermanos
+            if son_hermanos(ia, ib, grafo):
+                resultados.append((False, "Hermanos (comparten padre/madre conocido)"))
+                continue
+        # regla c) comparten ancestro en <= k generaciones; los conjuntos sólo
+        # se arman para informar los nombres
+        if comparten_ancestro(ia, ib, grafo, max_gen):
+            inter = ancestros(ia, grafo, max_gen) & ancestros(ib, grafo, max_gen)
+            comunes = sorted(ids[x] for x in inter)
+            resultados.append((False, f"Comparten ancestro en ≤{max_gen} generaciones: {', '.join(comunes)}"))
+            continue
+        # si pasa todo: permitido
+        resultados.append((True, "OK"))
+    return resultados
+
+def validar_union(a, b, grafo, profundidad, max_gen):
+    return validar_lote([(a, b)], grafo, profundidad, max_gen)[0]
+
+# ---- SALIDA ----
+def guardar_json(datos, path):
+    if orjson is not None:
+        with open(path, 'wb') as jf:
+            jf.write(orjson.dumps(datos, option=orjson.OPT_INDENT_2))
+    else:
+        with open(path, 'w', encoding='utf-8') as jf:
+            json.dump(datos, jf, ensure_ascii=False, indent=2)
 
 # ---- MAIN ----
 def main():
@@ -156,20 +307,16 @@ def main():
     personas = cargar_personas(PERSONAS_CSV)
     uniones = cargar_uniones(UNIONES_CSV)
 
-    padres_map, hijos_map, parejas = construir_grafos(uniones)
+    grafo, parejas = construir_grafos(uniones)
+    profundidad = calcular_profundidades(grafo)
 
     resultados = []
-    # asumimos que UNIONES_CSV contiene filas con la pareja (padre,madre). Recorremos parejas detectadas
-    parejas_list = set()
-    for u in uniones:
-        padre = u.get('padre') or u.get('Padre')
-        madre = u.get('madre') or u.get('Madre')
-        if padre and madre:
-            parejas_list.add((padre, madre))
-
     print(f"Validando uniones (max_generaciones={max_gen})\n")
-    for a, b in sorted(parejas_list):
-        permitido, motivo = validar_union(a, b, padres_map, max_gen)
+    # asumimos que UNIONES_CSV contiene filas con la pareja (padre,madre): se validan
+    # las parejas detectadas por construir_grafos, cada una una sola vez
+    validaciones = validar_lote(parejas, grafo, profundidad, max_gen)
+    lineas = []
+    for (a, b), (permitido, motivo) in zip(parejas, validaciones):
         estado = "OK" if permitido else "NO"
         fila = {
             "pareja": [a, b],
@@ -177,11 +324,11 @@ def main():
             "motivo": motivo
         }
         resultados.append(fila)
-        print(f"{a} + {b} -> {estado} ({motivo})")
+        lineas.append(f"{a} + {b} -> {estado} ({motivo})\n")
+    sys.stdout.write("".join(lineas))  # una sola escritura para todas las parejas
 
     # guardar JSON opcional
-    with open(OUTPUT_JSON, 'w', encoding='utf-8') as jf:
-        json.dump({"max_generaciones": max_gen, "resultados": resultados}, jf, ensure_ascii=False, indent=2)
+    guardar_json({"max_generaciones": max_gen, "resultados": resultados}, OUTPUT_JSON)
     print(f"\nGuardado JSON en {OUTPUT_JSON}")
 
 if __name__ == "__main__":